@@ -8,7 +8,7 @@ from flask import Flask, request
 import logging
 from .routes import main_bp
 from .extensions import cache
-from . import config
+from . import config, profiling
 
 def create_app():
     """Create and configure an instance of the Flask application."""
@@ -17,14 +17,22 @@ def create_app():
     # Configure logging
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-    # Configure Cache
-    app.config["CACHE_TYPE"] = "SimpleCache"
+    # Configure Cache: a per-process byte-budgeted LRU backed by a shared filesystem cache
+    app.config["CACHE_TYPE"] = "starlight.tiered_cache.TieredCache"
     app.config["CACHE_DEFAULT_TIMEOUT"] = 300
+    app.config["CACHE_DIR"] = config.CACHE_DIR
+    app.config["CACHE_THRESHOLD"] = config.CACHE_L2_THRESHOLD
+    app.config["CACHE_L1_BUDGETS"] = config.CACHE_L1_BUDGETS
+    app.config["CACHE_L1_MAX_ENTRY_BYTES"] = config.CACHE_L1_MAX_ENTRY_BYTES
+    app.config["CACHE_L2_MAX_ENTRY_BYTES"] = config.CACHE_L2_MAX_ENTRY_BYTES
     cache.init_app(app)
 
     # Register the blueprint
     app.register_blueprint(main_bp)
 
+    # Per-request timing breakdowns, slow request log and opt-in profiler
+    profiling.init_app(app)
+
     @app.context_processor
     def inject_config():
         return dict(config=config, request=request)
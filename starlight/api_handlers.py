@@ -8,13 +8,34 @@ fetching anime details, retrieving episode lists, and extracting download links.
 
 import requests
 import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 from bs4 import BeautifulSoup
 import logging
 from .config import API_BASE_URL, ANIME_PAGE_BASE_URL, API_HEADERS, REDIRECT_HEADERS
+from .profiling import timed
 
 # Configure logging for this module
 logger = logging.getLogger(__name__)
 
+# Matches a final kwik.cx download URL embedded in a pahe.win redirect page
+KWIK_LINK_PATTERN = re.compile(r'https:\/\/kwik\.cx\/f\/[a-zA-Z0-9]+')
+
+def _get(url, params=None, **kwargs):
+    """
+    Performs a GET request with `requests`, recording its duration as an upstream
+    call in the current request profile.
+    """
+    label = f"{url}?{urlencode(params)}" if params else url
+    with timed('upstream', label):
+        return requests.get(url, params=params, **kwargs)
+
+def _parse_html(markup, features, label):
+    """Parses HTML with BeautifulSoup, recording the parse time in the current request profile."""
+    with timed('parse', label):
+        return BeautifulSoup(markup, features)
+
 def _parse_related_anime_card(card_row_element):
     """
     Parses a BeautifulSoup element representing a single anime card (div with row mx-n1)
@@ -110,7 +131,7 @@ def fetch_anime_search_results(query):
     error_message = None
     try:
         params = {'m': 'search', 'q': query}
-        response = requests.get(API_BASE_URL, params=params, headers=API_HEADERS, timeout=10)
+        response = _get(API_BASE_URL, params=params, headers=API_HEADERS, timeout=10)
         response.raise_for_status()
         json_data = response.json()
         results = json_data.get('data', [])
@@ -122,13 +143,15 @@ def fetch_anime_search_results(query):
         error_message = f"An unexpected error occurred during search: {e}"
     return results, error_message
 
-def fetch_anime_details(anime_session_id):
+def fetch_anime_details(anime_session_id, supplement_episode_total=True):
     """
     Fetches and parses full details for a given anime session ID by scraping
     the animepahe.pw/anime/{anime_session_id} page.
 
     Args:
         anime_session_id (str): The unique session ID for the anime.
+        supplement_episode_total (bool): Whether to make an extra API call for the
+                                         episode count when the page does not list it.
 
     Returns:
         tuple: A tuple containing a dictionary of anime details and an error message.
@@ -146,9 +169,9 @@ def fetch_anime_details(anime_session_id):
     error_message = None
 
     try:
-        response = requests.get(detail_url, headers=API_HEADERS, timeout=15)
+        response = _get(detail_url, headers=API_HEADERS, timeout=15)
         response.raise_for_status()
-        soup = BeautifulSoup(response.text, 'lxml') 
+        soup = _parse_html(response.text, 'lxml', detail_url)
 
         # Extract Synopsis
         synopsis_tag = soup.find('div', class_='anime-synopsis')
@@ -208,10 +231,10 @@ def fetch_anime_details(anime_session_id):
                 anime_details['genre'] = 'N/A'
 
         # Supplement episode count via API if missing or unreliable
-        if anime_details.get('episodes', 'N/A') in ('N/A', '', None):
+        if supplement_episode_total and anime_details.get('episodes', 'N/A') in ('N/A', '', None):
             try:
                 episode_api_url = f"{API_BASE_URL}?m=release&id={anime_session_id}&sort=episode_desc&page=1"
-                response = requests.get(episode_api_url, headers=API_HEADERS, timeout=10)
+                response = _get(episode_api_url, headers=API_HEADERS, timeout=10)
                 response.raise_for_status()
                 json_data = response.json()
                 episodes_total = json_data.get('total')
@@ -284,7 +307,7 @@ def fetch_episode_list(anime_session_id, page, sort_order='episode_asc'):
             'm': 'release', 'id': anime_session_id,
             'sort': sort_order, 'page': page
         }
-        response = requests.get(API_BASE_URL, params=params, headers=API_HEADERS, timeout=10)
+        response = _get(API_BASE_URL, params=params, headers=API_HEADERS, timeout=10)
         response.raise_for_status()
         json_data = response.json()
         
@@ -304,6 +327,39 @@ def fetch_episode_list(anime_session_id, page, sort_order='episode_asc'):
 
     return episodes, pagination_data, error_message
 
+def fetch_anime_bundle(anime_session_id, sort_order='episode_asc'):
+    """
+    Fetches the anime details page and the first page of episodes concurrently.
+    The episode total is taken from the episode page, so no separate API call is
+    needed when the details page does not list it.
+
+    Args:
+        anime_session_id (str): The unique session ID for the anime.
+        sort_order (str): The order to sort episodes ('episode_asc' or 'episode_desc').
+
+    Returns:
+        dict: A dictionary with 'details', 'details_error', 'episodes', 'pagination'
+              and 'episodes_error' keys, mirroring the results of fetch_anime_details
+              and fetch_episode_list.
+    """
+    # Each task runs in a copy of the caller's context so its timings reach the request profile
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        details_future = executor.submit(contextvars.copy_context().run, fetch_anime_details, anime_session_id, False)
+        episodes_future = executor.submit(contextvars.copy_context().run, fetch_episode_list, anime_session_id, 1, sort_order)
+        anime_details, details_error = details_future.result()
+        episodes, pagination_data, episodes_error = episodes_future.result()
+
+    if anime_details.get('episodes', 'N/A') in ('N/A', '', None) and pagination_data.get('total'):
+        anime_details['episodes'] = str(pagination_data['total'])
+
+    return {
+        'details': anime_details,
+        'details_error': details_error,
+        'episodes': episodes,
+        'pagination': pagination_data,
+        'episodes_error': episodes_error,
+    }
+
 def fetch_episode_download_links(anime_session_id, episode_session_id):
     """
     Fetches the animepahe.pw play page for a specific episode,
@@ -318,16 +374,36 @@ def fetch_episode_download_links(anime_session_id, episode_session_id):
         tuple: A tuple containing a list of download links (dict) and an error message.
                Returns ([], error_message) on failure, (download_links, None) on success.
     """
+    final_downloads, _, error_message = fetch_episode_download_options(anime_session_id, episode_session_id)
+    return final_downloads, error_message
+
+def fetch_episode_download_options(anime_session_id, episode_session_id):
+    """
+    Resolves the download links for a specific episode like fetch_episode_download_links,
+    additionally reporting how many download options the play page offered. Options whose
+    redirect page could not be fetched or parsed are skipped, so fewer links than options
+    means the result is incomplete.
+
+    Args:
+        anime_session_id (str): The session ID of the anime.
+        episode_session_id (str): The session ID of the specific episode.
+
+    Returns:
+        tuple: A tuple containing a list of download links (dict), the number of download
+               options found on the play page, and an error message.
+               Returns ([], 0, error_message) on failure, (download_links, option_count, None) on success.
+    """
     play_url = f"https://animepahe.pw/play/{anime_session_id}/{episode_session_id}"
     final_downloads = []
+    option_count = 0
     error_message = None
     
     try:
         # 1. Fetch the animepahe.pw play page HTML
-        response_play_page = requests.get(play_url, headers=API_HEADERS, timeout=15)
+        response_play_page = _get(play_url, headers=API_HEADERS, timeout=15)
         response_play_page.raise_for_status()
 
-        soup_play_page = BeautifulSoup(response_play_page.text, 'html.parser')
+        soup_play_page = _parse_html(response_play_page.text, 'html.parser', play_url)
 
         # Find the div with id="pickDownload"
         download_div = soup_play_page.find('div', id='pickDownload')
@@ -341,14 +417,15 @@ def fetch_episode_download_links(anime_session_id, episode_session_id):
                 text = link_tag.get_text(strip=True)
                 
                 if initial_href:
+                    option_count += 1
                     try:
                         # 2. Fetch the redirect page (e.g., pahe.win/cvhun)
                         redirect_headers = REDIRECT_HEADERS.copy()
                         redirect_headers['Referer'] = play_url # Indicate where the request is coming from
                         
-                        response_redirect_page = requests.get(initial_href, headers=redirect_headers, timeout=15)
+                        response_redirect_page = _get(initial_href, headers=redirect_headers, timeout=15)
                         response_redirect_page.raise_for_status()
-                        soup_redirect_page = BeautifulSoup(response_redirect_page.text, 'html.parser')
+                        soup_redirect_page = _parse_html(response_redirect_page.text, 'html.parser', initial_href)
 
                         # 3. Find the script containing the real download link
                         script_tags = soup_redirect_page.find_all('script', type='text/javascript')
@@ -359,8 +436,7 @@ def fetch_episode_download_links(anime_session_id, episode_session_id):
                             script_content = target_script.string
 
                             if script_content and 'kwik.cx' in script_content:
-                                # Regex to find https://kwik.cx/f/ followed by alphanumeric characters
-                                match = re.search(r'https:\/\/kwik\.cx\/f\/[a-zA-Z0-9]+', script_content)
+                                match = KWIK_LINK_PATTERN.search(script_content)
                                 if match:
                                     found_kwik_link = match.group(0)
                                     
@@ -380,7 +456,7 @@ def fetch_episode_download_links(anime_session_id, episode_session_id):
         logger.error(f"An unexpected error occurred parsing initial downloads ({play_url}): {e}")
         error_message = 'An unexpected error occurred while parsing initial downloads.'
 
-    return final_downloads, error_message
+    return final_downloads, option_count, error_message
 
 def proxy_image_content(image_url):
     """
@@ -397,10 +473,13 @@ def proxy_image_content(image_url):
         return None, None
 
     try:
-        response = requests.get(image_url, headers=API_HEADERS, stream=True, timeout=10)
+        response = _get(image_url, headers=API_HEADERS, stream=True, timeout=10)
         response.raise_for_status()
         mimetype = response.headers.get('Content-Type', 'application/octet-stream')
-        return response.content, mimetype
+        # The body is streamed, so downloading it is part of the upstream time
+        with timed('upstream', image_url):
+            content = response.content
+        return content, mimetype
     except requests.exceptions.RequestException as e:
         logger.error(f"Error loading image from {image_url}: {e}")
         return None, None
@@ -427,7 +506,7 @@ def fetch_airing_anime(page):
     }
     try:
         params = {'m': 'airing', 'page': page}
-        response = requests.get(API_BASE_URL, params=params, headers=API_HEADERS, timeout=10)
+        response = _get(API_BASE_URL, params=params, headers=API_HEADERS, timeout=10)
         response.raise_for_status()
         json_data = response.json()
 
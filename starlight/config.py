@@ -4,6 +4,9 @@ config.py
 This module contains configuration settings for the Anime API, HTTP headers, and website metadata.
 """
 
+import os
+import tempfile
+
 # Base URL for the animepahe API
 API_BASE_URL = "https://animepahe.pw/api"
 
@@ -28,6 +31,60 @@ REDIRECT_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.127 Safari/537.36',
 }
 
+# Cache settings (see tiered_cache.py)
+# Directory for the filesystem cache (L2) shared by all worker processes
+CACHE_DIR = os.environ.get('STARLIGHT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'starlight-cache'))
+
+# Maximum number of entries kept in the shared L2 cache
+CACHE_L2_THRESHOLD = 2000
+
+# Largest single entry (in bytes) accepted by the cache at all
+CACHE_L2_MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+# Per-process L1 byte budgets for each namespace
+CACHE_L1_BUDGETS = {
+    'html': 8 * 1024 * 1024,     # Rendered pages
+    'json': 8 * 1024 * 1024,     # /api/ responses
+    'images': 16 * 1024 * 1024,  # /proxy-image responses
+    'data': 4 * 1024 * 1024,     # Handler results cached directly
+}
+
+# Largest single entry (in bytes) admitted into each L1 namespace
+CACHE_L1_MAX_ENTRY_BYTES = {
+    'html': 512 * 1024,
+    'json': 1024 * 1024,
+    'images': 1024 * 1024,
+    'data': 256 * 1024,
+}
+
+# Download link settings (see downloads.py)
+# SQLite file holding resolved kwik.cx download links
+DOWNLOAD_STORE_PATH = os.environ.get('STARLIGHT_DOWNLOAD_STORE', os.path.join(tempfile.gettempdir(), 'starlight-downloads.sqlite3'))
+
+# How long resolved download links are trusted, in seconds (7 days)
+DOWNLOAD_LINK_TTL = 7 * 24 * 3600
+
+# Number of following episodes whose download links are resolved in the background
+DOWNLOAD_PREFETCH_COUNT = 3
+
+# Maximum number of episode list pages scanned to locate the following episodes
+DOWNLOAD_PREFETCH_MAX_PAGES = 3
+
+# Profiling settings (see profiling.py)
+# Token required to profile a request or view the slow request log; profiling is disabled when unset
+ADMIN_TOKEN = os.environ.get('STARLIGHT_ADMIN_TOKEN')
+
+# Directory where cProfile dumps of profiled requests are written, and how many are kept
+PROFILE_DIR = os.environ.get('STARLIGHT_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'starlight-profiles'))
+PROFILE_MAX_FILES = 50
+
+# Requests taking longer than this many seconds are recorded in the slow request log
+SLOW_REQUEST_THRESHOLD = float(os.environ.get('STARLIGHT_SLOW_REQUEST_THRESHOLD', 2.0))
+
+# SQLite file holding the slow request log, and how many entries it keeps
+SLOW_REQUEST_LOG_PATH = os.environ.get('STARLIGHT_SLOW_REQUEST_LOG', os.path.join(tempfile.gettempdir(), 'starlight-slow-requests.sqlite3'))
+SLOW_REQUEST_LOG_SIZE = 200
+
 # Website Metadata
 WEBSITE_TITLE = "Starlight Anime Hub"
 WEBSITE_DESCRIPTION = "Your ultimate destination for anime streaming and information. Create constellations of your favorite anime, resume your trajectory, and stay updated with ongoing transmissions."
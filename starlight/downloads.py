@@ -0,0 +1,259 @@
+"""
+downloads.py
+~~~~~~~~~~~~
+This module keeps resolved kwik.cx download links in a persistent SQLite store
+and resolves the links of upcoming episodes in the background, so that opening
+the downloads of the next episode in a series is answered without waiting on the
+play page and pahe.win redirects.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .extensions import cache
+from .api_handlers import KWIK_LINK_PATTERN, fetch_episode_download_options, fetch_episode_list
+from .config import DOWNLOAD_STORE_PATH, DOWNLOAD_LINK_TTL, DOWNLOAD_PREFETCH_COUNT, DOWNLOAD_PREFETCH_MAX_PAGES
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+class DownloadLinkStore:
+    """
+    A small SQLite-backed store of resolved download links, keyed by anime and
+    episode session IDs. Entries expire after `ttl` seconds and are validated on
+    every read; invalid or expired entries are dropped and treated as misses.
+    """
+
+    def __init__(self, path, ttl):
+        self.path = path
+        self.ttl = ttl
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS download_links ('
+                    'anime_session_id TEXT NOT NULL, '
+                    'episode_session_id TEXT NOT NULL, '
+                    'links TEXT NOT NULL, '
+                    'stored_at REAL NOT NULL, '
+                    'PRIMARY KEY (anime_session_id, episode_session_id))'
+                )
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    @staticmethod
+    def _is_valid(links):
+        """Returns True if `links` is a non-empty list of {'text', 'href'} kwik.cx links."""
+        if not isinstance(links, list) or not links:
+            return False
+        for link in links:
+            if not isinstance(link, dict) or not isinstance(link.get('text'), str):
+                return False
+            if not isinstance(link.get('href'), str) or not KWIK_LINK_PATTERN.fullmatch(link['href']):
+                return False
+        return True
+
+    def get(self, anime_session_id, episode_session_id):
+        """
+        Returns the stored download links for an episode.
+
+        Returns:
+            list: The list of download links (dict), or None if missing, expired or invalid.
+        """
+        try:
+            connection = self._connect()
+            try:
+                row = connection.execute(
+                    'SELECT links, stored_at FROM download_links '
+                    'WHERE anime_session_id = ? AND episode_session_id = ?',
+                    (anime_session_id, episode_session_id)
+                ).fetchone()
+                if row is None:
+                    return None
+
+                links_json, stored_at = row
+                links = None
+                if time.time() - stored_at < self.ttl:
+                    try:
+                        links = json.loads(links_json)
+                    except ValueError:
+                        links = None
+                if self._is_valid(links):
+                    return links
+
+                connection.execute(
+                    'DELETE FROM download_links WHERE anime_session_id = ? AND episode_session_id = ?',
+                    (anime_session_id, episode_session_id)
+                )
+                connection.commit()
+                return None
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading download link store ({self.path}): {e}")
+            return None
+
+    def put(self, anime_session_id, episode_session_id, links):
+        """
+        Stores the download links for an episode. Invalid link lists are not stored.
+
+        Returns:
+            bool: True if the links were stored.
+        """
+        if not self._is_valid(links):
+            return False
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(
+                    'INSERT OR REPLACE INTO download_links '
+                    '(anime_session_id, episode_session_id, links, stored_at) VALUES (?, ?, ?, ?)',
+                    (anime_session_id, episode_session_id, json.dumps(links), time.time())
+                )
+                connection.commit()
+                return True
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing download link store ({self.path}): {e}")
+            return False
+
+
+link_store = DownloadLinkStore(DOWNLOAD_STORE_PATH, DOWNLOAD_LINK_TTL)
+
+# Background workers for prefetching, and the episodes currently being resolved
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='download-prefetch')
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+
+def get_episode_download_links(anime_session_id, episode_session_id):
+    """
+    Returns the download links for an episode from the store, resolving them on a miss.
+    Links are only stored when every download option on the play page resolved, so a
+    transient failure on one quality is retried on the next request.
+
+    Args:
+        anime_session_id (str): The session ID of the anime.
+        episode_session_id (str): The session ID of the specific episode.
+
+    Returns:
+        tuple: A tuple containing a list of download links (dict) and an error message.
+               Returns ([], error_message) on failure, (download_links, None) on success.
+    """
+    links = link_store.get(anime_session_id, episode_session_id)
+    if links is not None:
+        return links, None
+
+    links, option_count, error_message = fetch_episode_download_options(anime_session_id, episode_session_id)
+    if not error_message and len(links) == option_count:
+        link_store.put(anime_session_id, episode_session_id, links)
+    return links, error_message
+
+
+def _get_episode_sessions_page(anime_session_id, page):
+    """
+    Returns the (episodes, pagination_data) of an ascending episode list page, keeping
+    only each episode's number and session. Pages are cached briefly so consecutive
+    episodes of a binge do not refetch the list upstream.
+    """
+    cache_key = f"episode_sessions/{anime_session_id}/{page}"
+    cached_page = cache.get(cache_key)
+    if cached_page is None:
+        episodes, pagination_data, error_message = fetch_episode_list(anime_session_id, page)
+        if error_message:
+            return None
+        cached_page = (
+            [{'episode': episode.get('episode'), 'session': episode.get('session')} for episode in episodes],
+            pagination_data
+        )
+        cache.set(cache_key, cached_page, timeout=600)
+    return cached_page
+
+
+def _find_following_episodes(anime_session_id, episode_session_id, count, episode_number=None):
+    """
+    Finds the session IDs of the `count` episodes following `episode_session_id`.
+
+    When the episode number is known, the page holding it is estimated from the first
+    page's numbering and the scan starts one page before it. At most
+    DOWNLOAD_PREFETCH_MAX_PAGES pages are read after the first.
+    """
+    first_page = _get_episode_sessions_page(anime_session_id, 1)
+    if first_page is None:
+        return []
+
+    start_page = 1
+    episodes, pagination_data = first_page
+    per_page = pagination_data.get('per_page') or len(episodes)
+    last_page = pagination_data.get('last_page', 1)
+    if episode_number is not None and episodes and per_page:
+        try:
+            offset = float(episode_number) - float(episodes[0]['episode'])
+            estimated_page = int(offset // per_page) + 1
+            start_page = min(max(estimated_page - 1, 1), last_page)
+        except (TypeError, ValueError):
+            start_page = 1
+
+    following = []
+    found = False
+    for page in range(start_page, min(start_page + DOWNLOAD_PREFETCH_MAX_PAGES, last_page + 1)):
+        episode_page = first_page if page == 1 else _get_episode_sessions_page(anime_session_id, page)
+        if episode_page is None:
+            break
+        for episode in episode_page[0]:
+            if found:
+                following.append(episode.get('session'))
+                if len(following) >= count:
+                    break
+            elif episode.get('session') == episode_session_id:
+                found = True
+        if len(following) >= count:
+            break
+    return [session for session in following if session]
+
+
+def _prefetch_following_downloads(anime_session_id, episode_session_id, count, episode_number):
+    try:
+        following = _find_following_episodes(anime_session_id, episode_session_id, count, episode_number)
+        for next_session_id in following:
+            key = (anime_session_id, next_session_id)
+            with _in_flight_lock:
+                if key in _in_flight:
+                    continue
+                _in_flight.add(key)
+            try:
+                get_episode_download_links(anime_session_id, next_session_id)
+            finally:
+                with _in_flight_lock:
+                    _in_flight.discard(key)
+    except Exception as e:
+        logger.error(f"Error prefetching downloads after episode {episode_session_id} of {anime_session_id}: {e}")
+
+
+def schedule_download_prefetch(anime_session_id, episode_session_id, episode_number=None, count=DOWNLOAD_PREFETCH_COUNT):
+    """
+    Schedules background resolution of the download links for the `count` episodes
+    that follow the given episode. Episodes already stored are skipped without
+    any upstream requests.
+
+    Args:
+        anime_session_id (str): The session ID of the anime.
+        episode_session_id (str): The session ID of the episode being downloaded.
+        episode_number (str): The number of that episode, if known; used to jump to
+                              the right episode list page instead of scanning from page 1.
+        count (int): How many following episodes to resolve.
+    """
+    if count <= 0:
+        return
+    _prefetch_executor.submit(_prefetch_following_downloads, anime_session_id, episode_session_id, count, episode_number)
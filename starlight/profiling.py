@@ -0,0 +1,288 @@
+"""
+profiling.py
+~~~~~~~~~~~~
+This module provides per-request timing breakdowns, an opt-in cProfile hook
+and a slow-request log for the Starlight Anime Hub application.
+
+Every request collects a lightweight breakdown of time spent on upstream calls,
+HTML parsing and template rendering, together with cache hits and misses.
+Requests slower than SLOW_REQUEST_THRESHOLD are written to a bounded SQLite
+ring buffer. Admins can additionally run a single request under cProfile by
+sending the admin token together with the `profile` query flag or `X-Profile` header;
+such requests skip cache reads so the handler and its upstream calls actually run.
+"""
+
+import contextvars
+import cProfile
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from flask import g, request, jsonify, abort
+from flask.signals import before_render_template, template_rendered
+
+from .config import (
+    ADMIN_TOKEN, PROFILE_DIR, PROFILE_MAX_FILES,
+    SLOW_REQUEST_THRESHOLD, SLOW_REQUEST_LOG_PATH, SLOW_REQUEST_LOG_SIZE
+)
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+# The breakdown being collected for the current request, if any
+_current_profile = contextvars.ContextVar('starlight_request_profile', default=None)
+
+# cProfile can only run one profiler at a time, so profiled requests are serialized
+_profiler_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    Collects timed events and cache statistics for a single request. Events may be
+    recorded from worker threads that copied the request's context.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.events = []
+        self.cache = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'bypassed': 0}
+        # Set while the request runs under cProfile, so cached results do not hide the slow code
+        self.bypass_cache = False
+        self._lock = threading.Lock()
+
+    def add_event(self, category, label, seconds):
+        with self._lock:
+            self.events.append({'category': category, 'label': label, 'seconds': round(seconds, 4)})
+
+    def add_cache_result(self, result):
+        with self._lock:
+            self.cache[result] += 1
+
+    def summary(self):
+        """Returns the total seconds spent per event category."""
+        totals = {}
+        with self._lock:
+            for event in self.events:
+                totals[event['category']] = round(totals.get(event['category'], 0) + event['seconds'], 4)
+        return totals
+
+
+@contextmanager
+def timed(category, label):
+    """
+    Records the duration of the enclosed block as a `category` event of the current
+    request profile. Does nothing outside of a profiled request.
+    """
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_event(category, label, time.perf_counter() - start)
+
+
+def cache_reads_bypassed():
+    """Returns True if the current request is profiled and must not be served from the cache."""
+    profile = _current_profile.get()
+    return profile is not None and profile.bypass_cache
+
+
+def record_cache_result(result):
+    """Counts a cache lookup ('l1_hits', 'l2_hits', 'misses' or 'bypassed') against the current request."""
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.add_cache_result(result)
+
+
+class SlowRequestLog:
+    """
+    A bounded SQLite ring buffer of slow request breakdowns. Only the most recent
+    `size` entries are kept; older ones are removed as new entries are added.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            with self._lock:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS slow_requests ('
+                    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                    'recorded_at REAL NOT NULL, '
+                    'entry TEXT NOT NULL)'
+                )
+                connection.commit()
+                self._initialized = True
+        return connection
+
+    def append(self, entry):
+        """Adds an entry, dropping the oldest ones beyond the buffer size."""
+        try:
+            connection = self._connect()
+            try:
+                cursor = connection.execute(
+                    'INSERT INTO slow_requests (recorded_at, entry) VALUES (?, ?)',
+                    (time.time(), json.dumps(entry))
+                )
+                connection.execute('DELETE FROM slow_requests WHERE id <= ?', (cursor.lastrowid - self.size,))
+                connection.commit()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error writing slow request log ({self.path}): {e}")
+
+    def recent(self, limit=50):
+        """Returns up to `limit` of the most recent entries, newest first."""
+        try:
+            connection = self._connect()
+            try:
+                rows = connection.execute(
+                    'SELECT entry FROM slow_requests ORDER BY id DESC LIMIT ?', (limit,)
+                ).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error as e:
+            logger.error(f"Error reading slow request log ({self.path}): {e}")
+            return []
+        return [json.loads(row[0]) for row in rows]
+
+
+slow_request_log = SlowRequestLog(SLOW_REQUEST_LOG_PATH, SLOW_REQUEST_LOG_SIZE)
+
+
+def is_admin_request():
+    """Returns True if the request carries the configured admin token."""
+    if not ADMIN_TOKEN:
+        return False
+    token = request.headers.get('X-Admin-Token') or request.args.get('admin_token', '')
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def _wants_profiler():
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    return flag in ('1', 'true') and is_admin_request()
+
+
+def _loggable_path():
+    """Returns the request path and query string without the admin token and profiling flag."""
+    args = [(key, value) for key, value in request.args.items(multi=True) if key not in ('admin_token', 'profile')]
+    return f"{request.path}?{urlencode(args)}" if args else request.path
+
+
+def _save_profile(profiler):
+    """Writes a cProfile dump to PROFILE_DIR, keeping only the newest PROFILE_MAX_FILES dumps."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    endpoint = (request.endpoint or 'unknown').replace('.', '-')
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-{os.getpid()}-{uuid.uuid4().hex[:8]}.prof"
+    profiler.dump_stats(os.path.join(PROFILE_DIR, filename))
+
+    dumps = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith('.prof')),
+        key=lambda entry: entry.stat().st_mtime
+    )
+    for entry in dumps[:-PROFILE_MAX_FILES]:
+        os.remove(entry.path)
+    return filename
+
+
+def _before_request():
+    profile = RequestProfile()
+    g.request_profile = profile
+    g.request_profile_token = _current_profile.set(profile)
+
+    if _wants_profiler() and _profiler_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            g.profiler = profiler
+            profile.bypass_cache = True
+        except ValueError as e:
+            # Another profiling tool is already active in this interpreter
+            logger.warning(f"Could not start profiler: {e}")
+            _profiler_lock.release()
+
+
+def _after_request(response):
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return response
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+        try:
+            response.headers['X-Profile-File'] = _save_profile(profiler)
+        except OSError as e:
+            logger.error(f"Could not save request profile: {e}")
+
+    elapsed = time.perf_counter() - profile.started_at
+    if elapsed >= SLOW_REQUEST_THRESHOLD:
+        entry = {
+            'method': request.method,
+            'path': _loggable_path(),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'seconds': round(elapsed, 4),
+            'totals': profile.summary(),
+            'cache': dict(profile.cache),
+            'events': profile.events,
+        }
+        logger.warning(f"Slow request {entry['path']} took {entry['seconds']}s: {entry['totals']}")
+        slow_request_log.append(entry)
+    return response
+
+
+def _teardown_request(exc):
+    token = g.pop('request_profile_token', None)
+    if token is not None:
+        _current_profile.reset(token)
+    # Make sure a profiler is never left running if the request failed
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+
+def _record_render_start(sender, template, context, **extra):
+    g.setdefault('render_started_at', []).append(time.perf_counter())
+
+
+def _record_render_end(sender, template, context, **extra):
+    started = g.get('render_started_at')
+    profile = _current_profile.get()
+    if started and profile is not None:
+        profile.add_event('render', template.name, time.perf_counter() - started.pop())
+
+
+def slow_requests():
+    """Returns the most recent slow request breakdowns as JSON (admin only)."""
+    if not is_admin_request():
+        abort(404)
+    limit = request.args.get('limit', 50, type=int)
+    return jsonify({'slow_requests': slow_request_log.recent(limit)})
+
+
+def init_app(app):
+    """Registers the request hooks, template signals and admin endpoint on the app."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    before_render_template.connect(_record_render_start, app)
+    template_rendered.connect(_record_render_end, app)
+    app.add_url_rule('/admin/slow-requests', 'slow_requests', slow_requests)
@@ -5,13 +5,13 @@ This module defines the Flask routes for the Starlight Anime Hub application.
 It uses functions from api_handlers to fetch and process data.
 """
 
-from flask import Blueprint, request, render_template, jsonify, url_for, current_app
+from flask import Blueprint, request, render_template, jsonify, url_for, current_app, send_from_directory
 from .extensions import cache
+from .downloads import get_episode_download_links, schedule_download_prefetch
 from .api_handlers import (
     fetch_anime_search_results,
-    fetch_anime_details,
+    fetch_anime_bundle,
     fetch_episode_list,
-    fetch_episode_download_links,
     proxy_image_content,
     fetch_airing_anime
 )
@@ -25,6 +25,24 @@ main_bp = Blueprint('main', __name__)
 # Configure logging for this module
 logger = logging.getLogger(__name__)
 
+# The bundle only needs to outlive the move between the details and episode pages.
+# It is kept short because the page views cache their own copy for up to an hour.
+ANIME_BUNDLE_TIMEOUT = 300
+
+def _get_anime_bundle(anime_session_id):
+    """
+    Returns the details and first episode page for an anime, fetching both
+    concurrently on a cache miss. The bundle is shared by the anime details page
+    and the first page of the episode list, so opening either one warms the other.
+    """
+    cache_key = f"anime_bundle/{anime_session_id}"
+    bundle = cache.get(cache_key)
+    if bundle is None:
+        bundle = fetch_anime_bundle(anime_session_id)
+        if not bundle['details_error'] and not bundle['episodes_error']:
+            cache.set(cache_key, bundle, timeout=ANIME_BUNDLE_TIMEOUT)
+    return bundle
+
 @main_bp.route('/', methods=['GET'])
 @cache.cached(timeout=300, query_string=True)
 def home_page():
@@ -87,8 +105,9 @@ def anime_detail(anime_session_id):
     # Get anime_title from query parameters, using it as the primary title
     anime_title = request.args.get('anime_title', 'N/A')
     
-    # Fetch details using the handler
-    anime_details, error_message = fetch_anime_details(anime_session_id)
+    # Fetch details (together with the first episode page) using the handler
+    bundle = _get_anime_bundle(anime_session_id)
+    anime_details, error_message = bundle['details'], bundle['details_error']
     
     # Override title if it's 'N/A' from the fetch and we have it from query
     if anime_details.get('title') == 'N/A' and anime_title != 'N/A':
@@ -117,8 +136,14 @@ def episode_selection_page(anime_session_id):
     # Get sort order from query parameters, default to 'episode_asc'
     sort_order = request.args.get('sort', 'episode_asc')
 
-    # Fetch episodes and pagination data using the handler
-    episodes, pagination_data, error_message = fetch_episode_list(anime_session_id, page, sort_order)
+    # Fetch episodes and pagination data using the handler.
+    # The default first page comes from the bundle shared with the details page.
+    if page == 1 and sort_order == 'episode_asc':
+        bundle = _get_anime_bundle(anime_session_id)
+        episodes, error_message = bundle['episodes'], bundle['episodes_error']
+        pagination_data = dict(bundle['pagination'])
+    else:
+        episodes, pagination_data, error_message = fetch_episode_list(anime_session_id, page, sort_order)
     
     # Generate next/prev page URLs for the template
     # Make sure to pass anime_title and sort_order to ensure continuity in navigation
@@ -178,16 +203,32 @@ def get_anime_episodes_json(anime_session_id):
         return jsonify({'episodes': all_episodes})
 
 
+@main_bp.route('/api/anime-bundle/<string:anime_session_id>', methods=['GET'])
+def get_anime_bundle_json(anime_session_id):
+    """
+    Returns the anime details and the first page of episodes as JSON,
+    fetched concurrently in a single request.
+    """
+    bundle = _get_anime_bundle(anime_session_id)
+    if bundle['details_error'] and bundle['episodes_error']:
+        return jsonify({'error': bundle['details_error']}), 500
+    return jsonify(bundle)
+
+
 @main_bp.route('/api/episode-downloads/<string:anime_session_id>/<string:episode_session_id>', methods=['GET'])
-@cache.cached(timeout=900)
 def get_episode_downloads(anime_session_id, episode_session_id):
     """
-    Fetches download links for a specific episode using the API handler.
+    Fetches download links for a specific episode from the persistent link store,
+    resolving them on a miss, and starts resolving the next few episodes in the background.
+    The optional 'episode' query parameter (the episode number) lets the prefetch find
+    the following episodes without scanning the whole episode list.
     """
-    downloads, error_message = fetch_episode_download_links(anime_session_id, episode_session_id)
+    downloads, error_message = get_episode_download_links(anime_session_id, episode_session_id)
     
     if error_message:
         return jsonify({'error': error_message}), 500
+
+    schedule_download_prefetch(anime_session_id, episode_session_id, request.args.get('episode'))
     return jsonify({'downloads': downloads})
 
 @main_bp.route('/proxy-image')
@@ -216,6 +257,19 @@ def proxy_image():
     return response
 
 
+@main_bp.route('/service-worker.js')
+def service_worker():
+    """
+    Serves the service worker from the site root so its scope covers every page,
+    the JSON API routes and the image proxy (a worker under /static/js/ could only
+    control /static/js/ requests).
+    """
+    response = send_from_directory(current_app.static_folder, 'js/service-worker.js', mimetype='application/javascript')
+    # Browsers must always revalidate the worker script so new cache versions roll out promptly
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @main_bp.route('/bookmarks')
 def bookmarks_page():
     """
@@ -412,11 +412,11 @@
                 viewDetailsBtn.href = `/anime/${animeSessionId}?anime_title=${encodeURIComponent(animeTitle)}`;
                 downloadEpisodeBtn.onclick = function() {
                     closeModal(episodeOptionsModal);
-                    showDownloads(animeSessionId, episodeSessionId, 'Episode ' + episodeNumber);
+                    showDownloads(animeSessionId, episodeSessionId, 'Episode ' + episodeNumber, episodeNumber);
                 };
                 openModal(episodeOptionsModal);
             } else {
-                showDownloads(animeSessionId, episodeSessionId, 'Episode ' + episodeNumber);
+                showDownloads(animeSessionId, episodeSessionId, 'Episode ' + episodeNumber, episodeNumber);
             }
         }
     }
@@ -426,8 +426,9 @@
      * @param {string} animeSessionId The session ID of the anime.
      * @param {string} episodeSessionId The session ID of the specific episode.
      * @param {string} episodeTitle A display title for the episode.
+     * @param {string} [episodeNumber] The episode number, used by the server to prefetch following episodes.
      */
-    async function showDownloads(animeSessionId, episodeSessionId, episodeTitle) {
+    async function showDownloads(animeSessionId, episodeSessionId, episodeTitle, episodeNumber) {
         const modalTitleElement = downloadModalTitle || document.getElementById('modalTitle');
         if (!downloadModal || !modalTitleElement || !downloadLinksContainer || !loadingMessage || !noLinksFoundMessage || !errorMessage) {
             console.error("Download modal elements not found.");
@@ -444,7 +445,8 @@
         openModal(downloadModal);
 
         try {
-            const response = await fetch(`/api/episode-downloads/${animeSessionId}/${episodeSessionId}`);
+            const query = episodeNumber ? `?episode=${encodeURIComponent(episodeNumber)}` : '';
+            const response = await fetch(`/api/episode-downloads/${animeSessionId}/${episodeSessionId}${query}`);
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
@@ -825,7 +827,7 @@
         // Register Service Worker
         if ('serviceWorker' in navigator) {
             window.addEventListener('load', () => {
-                navigator.serviceWorker.register('/static/js/service-worker.js')
+                navigator.serviceWorker.register('/service-worker.js')
                     .then(registration => {
                         console.log('Service Worker registered with scope:', registration.scope);
                     })
@@ -1,46 +1,168 @@
-const CACHE_NAME = 'starlight-anime-hub-cache-v1';
+// Bump CACHE_VERSION whenever the precache list or routing strategies change;
+// caches from older versions are removed on activate. Static assets are
+// revalidated on every request, so deploys do not require a version bump.
+const CACHE_VERSION = 'v2';
+const CACHE_PREFIX = 'starlight-anime-hub';
+const STATIC_CACHE = `${CACHE_PREFIX}-static-${CACHE_VERSION}`;
+const PAGES_CACHE = `${CACHE_PREFIX}-pages-${CACHE_VERSION}`;
+const API_CACHE = `${CACHE_PREFIX}-api-${CACHE_VERSION}`;
+const IMAGE_CACHE = `${CACHE_PREFIX}-images-${CACHE_VERSION}`;
+
+// Maximum number of entries kept in each runtime cache before the
+// least recently used ones are evicted.
+const MAX_ENTRIES = {
+    [PAGES_CACHE]: 50,
+    [API_CACHE]: 100,
+    [IMAGE_CACHE]: 300,
+};
+
 const urlsToCache = [
     '/',
     '/static/css/tailwind.css',
+    '/static/css/style.css',
     '/static/js/main.js',
     '/static/img/favicon.ico',
-    // Add other assets you want to cache, e.g., images, fonts
 ];
 
 self.addEventListener('install', event => {
     event.waitUntil(
-        caches.open(CACHE_NAME)
-            .then(cache => {
-                console.log('Opened cache');
-                return cache.addAll(urlsToCache);
-            })
-    );
-});
-
-self.addEventListener('fetch', event => {
-    event.respondWith(
-        caches.match(event.request)
-            .then(response => {
-                // Cache hit - return response
-                if (response) {
-                    return response;
-                }
-                return fetch(event.request);
-            })
+        caches.open(STATIC_CACHE)
+            .then(cache => cache.addAll(urlsToCache))
+            .then(() => self.skipWaiting())
     );
 });
 
 self.addEventListener('activate', event => {
-    const cacheWhitelist = [CACHE_NAME];
+    const cacheWhitelist = [STATIC_CACHE, PAGES_CACHE, API_CACHE, IMAGE_CACHE];
     event.waitUntil(
-        caches.keys().then(cacheNames => {
-            return Promise.all(
+        caches.keys()
+            .then(cacheNames => Promise.all(
                 cacheNames.map(cacheName => {
                     if (cacheWhitelist.indexOf(cacheName) === -1) {
                         return caches.delete(cacheName);
                     }
                 })
-            );
-        })
+            ))
+            .then(() => self.clients.claim())
+    );
+});
+
+self.addEventListener('fetch', event => {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+
+    if (url.pathname.startsWith('/api/anime-episodes/') ||
+        url.pathname.startsWith('/api/anime-bundle/') ||
+        url.pathname.startsWith('/api/episode-downloads/')) {
+        respondStaleWhileRevalidate(event, API_CACHE);
+    } else if (url.pathname === '/proxy-image') {
+        event.respondWith(cacheFirst(request, IMAGE_CACHE));
+    } else if (request.mode === 'navigate') {
+        event.respondWith(networkFirst(request, PAGES_CACHE));
+    } else if (url.pathname.startsWith('/static/')) {
+        // Asset URLs are not versioned, so always revalidate to pick up new deploys
+        respondStaleWhileRevalidate(event, STATIC_CACHE);
+    }
+});
+
+/**
+ * Stores a successful response in the named cache and trims the cache
+ * to its configured size. Error responses are never cached.
+ */
+async function putInCache(cacheName, request, response) {
+    if (!response || !response.ok) {
+        return;
+    }
+    const cache = await caches.open(cacheName);
+    // Delete first so the entry moves to the end of the key order (most recently used).
+    await cache.delete(request);
+    await cache.put(request, response);
+    await trimCache(cacheName);
+}
+
+/**
+ * Evicts the oldest entries of a cache until it fits within MAX_ENTRIES.
+ * Cache keys are returned in insertion order, so the first keys are the
+ * least recently stored or touched.
+ */
+async function trimCache(cacheName) {
+    const maxEntries = MAX_ENTRIES[cacheName];
+    if (!maxEntries) {
+        return;
+    }
+    const cache = await caches.open(cacheName);
+    const keys = await cache.keys();
+    const excess = keys.length - maxEntries;
+    for (let i = 0; i < excess; i++) {
+        await cache.delete(keys[i]);
+    }
+}
+
+/**
+ * Serves from cache when possible and falls back to the network,
+ * caching the network response for next time. Cache hits are re-inserted
+ * so that eviction follows least-recently-used order.
+ */
+async function cacheFirst(request, cacheName) {
+    const cache = await caches.open(cacheName);
+    const cached = await cache.match(request);
+    if (cached) {
+        if (MAX_ENTRIES[cacheName]) {
+            const touched = cached.clone();
+            cache.delete(request).then(() => cache.put(request, touched));
+        }
+        return cached;
+    }
+    const response = await fetch(request);
+    putInCache(cacheName, request, response.clone());
+    return response;
+}
+
+/**
+ * Responds with the cached response immediately (if any) while a network
+ * request refreshes the cache in the background. The network request is
+ * started up front so the cache update is tied to the event's lifetime
+ * even when a stale copy is served.
+ */
+function respondStaleWhileRevalidate(event, cacheName) {
+    const request = event.request;
+    const networkFetch = fetch(request);
+    event.waitUntil(
+        networkFetch
+            .then(response => putInCache(cacheName, request, response.clone()))
+            .catch(() => undefined)
     );
-});
\ No newline at end of file
+    event.respondWith(
+        caches.match(request, { cacheName })
+            .then(cached => cached || networkFetch)
+    );
+}
+
+/**
+ * Tries the network first so pages are always fresh, falling back to the
+ * last cached copy (or the precached home page) when offline.
+ */
+async function networkFirst(request, cacheName) {
+    try {
+        const response = await fetch(request);
+        putInCache(cacheName, request, response.clone());
+        return response;
+    } catch (error) {
+        const cached = await caches.match(request);
+        if (cached) {
+            return cached;
+        }
+        const fallback = await caches.match('/');
+        if (fallback) {
+            return fallback;
+        }
+        throw error;
+    }
+}
@@ -0,0 +1,221 @@
+"""
+tiered_cache.py
+~~~~~~~~~~~~~~~
+This module provides a byte-budgeted, two-tier cache backend for Flask-Caching.
+
+Entries are serialized once and accounted for by their size in bytes rather than
+by entry count. Each worker process keeps a small, hot in-memory LRU (L1) split
+into per-namespace byte budgets (html, json, images, data), backed by a larger
+filesystem cache (L2) that is shared between all workers on the same host.
+Entries that are too large for a namespace are refused by admission control
+instead of evicting everything else.
+"""
+
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from cachelib import FileSystemCache
+from flask_caching.backends.base import BaseCache
+
+from .profiling import cache_reads_bypassed, record_cache_result
+
+# Configure logging for this module
+logger = logging.getLogger(__name__)
+
+
+def namespace_for_key(key):
+    """
+    Maps a cache key to the namespace whose budget it is charged against.
+
+    Keys produced by ``cache.cached`` contain the request path, so image proxy
+    and JSON API responses can be told apart from rendered pages. Everything
+    else (memoized or explicitly cached handler results) falls under 'data'.
+
+    Args:
+        key (str): The cache key.
+
+    Returns:
+        str: One of 'images', 'json', 'html' or 'data'.
+    """
+    if '/proxy-image' in key:
+        return 'images'
+    if '/api/' in key:
+        return 'json'
+    if key.startswith('view/') or key.startswith('/'):
+        return 'html'
+    return 'data'
+
+
+class ByteBudgetLRU:
+    """
+    A thread-safe in-memory LRU of serialized entries, with a separate byte budget
+    per namespace. Adding an entry evicts the least recently used entries of the
+    same namespace until the new entry fits.
+    """
+
+    def __init__(self, budgets, max_entry_bytes):
+        self.budgets = dict(budgets)
+        self.max_entry_bytes = dict(max_entry_bytes)
+        self._entries = {namespace: OrderedDict() for namespace in self.budgets}
+        self._used = {namespace: 0 for namespace in self.budgets}
+        self._lock = threading.Lock()
+
+    def admits(self, namespace, size):
+        """Returns True if an entry of `size` bytes may be stored in `namespace`."""
+        budget = self.budgets.get(namespace, 0)
+        limit = self.max_entry_bytes.get(namespace, budget)
+        return 0 < size <= min(limit, budget)
+
+    def get(self, namespace, key):
+        """Returns the (expires_at, payload) pair for `key`, or None if missing or expired."""
+        with self._lock:
+            entries = self._entries.get(namespace)
+            if entries is None or key not in entries:
+                return None
+            expires_at, payload = entries[key]
+            if expires_at and expires_at <= time.time():
+                self._remove(namespace, key)
+                return None
+            entries.move_to_end(key)
+            return expires_at, payload
+
+    def set(self, namespace, key, expires_at, payload):
+        """Stores `payload` under `key`, returning False if admission control refused it."""
+        size = len(payload)
+        with self._lock:
+            self._remove(namespace, key)
+            if not self.admits(namespace, size):
+                return False
+            entries = self._entries[namespace]
+            while entries and self._used[namespace] + size > self.budgets[namespace]:
+                oldest_key = next(iter(entries))
+                self._remove(namespace, oldest_key)
+            entries[key] = (expires_at, payload)
+            self._used[namespace] += size
+            return True
+
+    def delete(self, namespace, key):
+        """Removes `key` from `namespace`, returning True if it was present."""
+        with self._lock:
+            return self._remove(namespace, key)
+
+    def clear(self):
+        """Removes every entry from every namespace."""
+        with self._lock:
+            for namespace in self._entries:
+                self._entries[namespace].clear()
+                self._used[namespace] = 0
+
+    def usage(self):
+        """Returns a dict of namespace -> (bytes used, bytes budgeted, entry count)."""
+        with self._lock:
+            return {
+                namespace: (self._used[namespace], self.budgets[namespace], len(entries))
+                for namespace, entries in self._entries.items()
+            }
+
+    def _remove(self, namespace, key):
+        # Caller must hold the lock
+        entries = self._entries.get(namespace)
+        if entries is None or key not in entries:
+            return False
+        _, payload = entries.pop(key)
+        self._used[namespace] -= len(payload)
+        return True
+
+
+class TieredCache(BaseCache):
+    """
+    Flask-Caching backend combining a per-process ByteBudgetLRU (L1) with a shared
+    FileSystemCache (L2). Values are pickled once on `set`; the pickled size is what
+    the budgets and admission limits are measured against.
+
+    Enable it with ``CACHE_TYPE = "starlight.tiered_cache.TieredCache"``.
+    """
+
+    def __init__(self, cache_dir, l1_budgets, l1_max_entry_bytes, default_timeout=300,
+                 l2_threshold=2000, l2_max_entry_bytes=8 * 1024 * 1024):
+        super().__init__(default_timeout=default_timeout)
+        self.l1 = ByteBudgetLRU(l1_budgets, l1_max_entry_bytes)
+        self.l2 = FileSystemCache(cache_dir, threshold=l2_threshold, default_timeout=default_timeout)
+        self.l2_max_entry_bytes = l2_max_entry_bytes
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            cache_dir=config['CACHE_DIR'],
+            l1_budgets=config['CACHE_L1_BUDGETS'],
+            l1_max_entry_bytes=config['CACHE_L1_MAX_ENTRY_BYTES'],
+            l2_threshold=config.get('CACHE_THRESHOLD', 2000),
+            l2_max_entry_bytes=config.get('CACHE_L2_MAX_ENTRY_BYTES', 8 * 1024 * 1024),
+        )
+        return cls(*args, **kwargs)
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout else 0
+
+    def get(self, key):
+        if cache_reads_bypassed():
+            record_cache_result('bypassed')
+            return None
+        namespace = namespace_for_key(key)
+        entry = self.l1.get(namespace, key)
+        if entry is not None:
+            record_cache_result('l1_hits')
+        else:
+            entry = self.l2.get(key)
+            if entry is None or (entry[0] and entry[0] <= time.time()):
+                record_cache_result('misses')
+                return None
+            record_cache_result('l2_hits')
+            # Promote into L1 with the remaining lifetime of the L2 entry
+            expires_at, payload = entry
+            self.l1.set(namespace, key, expires_at, payload)
+        try:
+            return pickle.loads(entry[1])
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key, value, timeout=None):
+        try:
+            payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"Could not serialize cache entry {key}: {e}")
+            return False
+
+        size = len(payload)
+        if size > self.l2_max_entry_bytes:
+            logger.info(f"Refusing to cache {key}: {size} bytes exceeds the entry limit")
+            self.delete(key)
+            return False
+
+        timeout = self._normalize_timeout(timeout)
+        expires_at = self._expires_at(timeout)
+        self.l1.set(namespace_for_key(key), key, expires_at, payload)
+        return self.l2.set(key, (expires_at, payload), timeout=timeout)
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout=timeout)
+
+    def delete(self, key):
+        in_l1 = self.l1.delete(namespace_for_key(key), key)
+        in_l2 = self.l2.delete(key)
+        return in_l1 or in_l2
+
+    def has(self, key):
+        if self.l1.get(namespace_for_key(key), key) is not None:
+            return True
+        entry = self.l2.get(key)
+        return entry is not None and (not entry[0] or entry[0] > time.time())
+
+    def clear(self):
+        self.l1.clear()
+        return self.l2.clear()